@@ -29,6 +29,7 @@ from ui import (
     render_chat_qa_item
 )
 from ui.graph_view import (
+    inject_global_css_once,
     render_graph_in_streamlit,
     render_graph_statistics,
     render_legend
@@ -267,6 +268,7 @@ def main():
     """主函数"""
     # 初始化页面配置
     init_page_config()
+    inject_global_css_once()
     
     # 初始化 session state
     init_session_state()
@@ -358,6 +358,25 @@ class KnowledgeGraph:
                 sources.append(doc_name)
         return sources
     
+    def get_entity_source_counts(self, entities: Tuple[str, ...]) -> Dict[str, int]:
+        """
+        批量获取多个实体各自来自多少篇文献（只遍历一次文档-实体映射）
+        
+        Args:
+            entities: 实体名称元组
+            
+        Returns:
+            实体名称 -> 来源文献数量 的字典
+        """
+        counts = dict.fromkeys(entities, 0)
+        for entities_by_type in self._document_entities.values():
+            doc_entities = set()
+            for entity_list in entities_by_type.values():
+                doc_entities.update(entity_list)
+            for name in doc_entities & counts.keys():
+                counts[name] += 1
+        return counts
+    
     def _rebuild_canonical_forms(self) -> None:
         """
         从 document_entities 重新构建实体规范化映射
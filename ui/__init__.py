@@ -329,7 +329,7 @@ def render_chat_qa_item(chat: dict, index: int, is_latest: bool = False):
     # 使用原生 st.chat_message 渲染回答（使用引用溯源组件）
     with st.chat_message("assistant", avatar="🤖"):
         # 使用新的引用溯源渲染函数，将 [doc_X] 转为彩色标签
-        render_chat_answer_with_sources(answer, sources, is_latest=is_latest)
+        render_chat_answer_with_sources(answer, sources, is_latest=is_latest, key=f"chat_{index}")
 
 
 def get_custom_css() -> str:
@@ -524,6 +524,9 @@ def init_page_config():
     
     # 注入自定义 CSS
     st.markdown(get_custom_css(), unsafe_allow_html=True)
+    
+    # 每次运行开始时清空 "已注入 CSS" 记录，各模块的样式在本次运行中首次使用时注入一次
+    st.session_state["_injected_css"] = set()
 
 
 def render_sidebar_api_config():
@@ -5,11 +5,31 @@
 3. 保持 st.components.v1.html 安全渲染。
 """
 
+import base64
+import gzip
+import hashlib
+import heapq
 import json
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
 import networkx as nx
 import streamlit as st
 import streamlit.components.v1 as components
-from typing import Dict, Any, Optional
+from streamlit.errors import StreamlitAPIException
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import GRAPHS_DIR
+
+try:
+    import orjson  # 可选依赖：C 实现的 JSON 序列化，比标准库快数倍
+except ImportError:
+    orjson = None
+
+# 局部重运行：过滤器交互只重跑图谱区块，不重跑整个页面（Streamlit >= 1.33 为 st.fragment，
+# 1.32 为 st.experimental_fragment；更早的版本退化为普通函数，行为与整页重运行一致）
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 # --- 节点配色与配置 ---
 NODE_CONFIG = {
@@ -21,6 +41,47 @@ NODE_CONFIG = {
     "application": {"color": "#06b6d4", "radius": 18, "icon": "💻", "label": "Application (应用)"}
 }
 
+def _dumps(obj: Any) -> str:
+    """
+    紧凑 JSON 序列化：去掉分隔符空格，中文不转义为 \\uXXXX（每个汉字 3 字节而非 6 字节）
+    
+    已安装 orjson 时优先使用，否则回退到标准库 json，两者输出格式一致
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+# 节点类型 -> 下标（NODE_CONFIG 的插入顺序），前端按下标访问配置数组
+_GROUP_INDEX = {k: i for i, k in enumerate(NODE_CONFIG)}
+
+# NODE_CONFIG 不随调用变化，导入时按上述顺序序列化为数组一次
+_NODE_CONFIG_JSON = _dumps([{"type": k, **v} for k, v in NODE_CONFIG.items()])
+
+# 布局坐标量化精度：[-1, 1] 映射到 [-1000, 1000]，展开后误差约 1px
+_LAYOUT_SCALE = 1000
+
+# 内联数据超过该大小（字符数）时 gzip + base64 压缩后再下发
+_COMPRESS_MIN_BYTES = 16 * 1024
+
+# 节点标签显示长度上限（桥梁节点显示更长的名字）
+_LABEL_MAX_LEN = 15
+_BRIDGE_LABEL_MAX_LEN = 30
+
+# 交给浏览器渲染的节点上限（vis/D3 力导向在浏览器端约为 O(N²)，超过后先在服务端裁剪）
+MAX_RENDER_NODES = 800
+
+# 图例条目是静态的，导入时生成一次，渲染时只按选中类型拼接
+_LEGEND_ITEM_HTML: Dict[str, str] = {
+    k: f"""
+            <div class='legend-item'>
+                <div class='legend-dot' style='background:{v['color']}'></div>
+                <span>{v['label']}</span>
+            </div>
+            """
+    for k, v in NODE_CONFIG.items()
+}
+
 # --- D3.js 完整模板 ---
 # 注意：这里使用标准的 CSS/JS 语法 (单花括号)，因为我们将使用 .replace() 而不是 .format()
 D3_TEMPLATE = """
@@ -81,12 +142,16 @@ D3_TEMPLATE = """
             font-size: 11px;
             fill: #e2e8f0;
         }
-        .link { stroke: #334155; stroke-opacity: 0.4; transition: all 0.3s; }
-        .halo { transition: r 0.3s cubic-bezier(0.34, 1.56, 0.64, 1); }
+        /* 连线绘制在 canvas 上，节点 SVG 叠加在其上方 */
+        #graph { position: relative; width: 100vw; height: 100vh; }
+        #graph canvas, #graph svg { position: absolute; top: 0; left: 0; }
+        /* 细节层次 (LOD)：缩小到一定程度后隐藏标签、光晕 */
+        .lod-no-label .node-label { display: none; }
+        .lod-no-halo .halo { display: none; }
         
-        /* 交互高亮类 */
-        .dimmed { opacity: 0.1; }
-        .highlighted { stroke: #fcd34d; stroke-width: 2px; stroke-opacity: 1; }
+        /* 交互高亮类：聚焦模式下非聚焦节点变暗，只需切换当前节点及邻居的 focused 类 */
+        .focus-mode .node { opacity: 0.1; }
+        .focus-mode .node.focused { opacity: 1; }
         
         /* 桥梁节点样式 - 连接多个文献的重要节点 */
         .bridge-node .bridge-glow {
@@ -103,13 +168,6 @@ D3_TEMPLATE = """
             }
         }
         
-        /* 桥梁边样式 - 连接桥梁节点和文献的边 */
-        .bridge-link {
-            stroke: #fbbf24 !important;
-            stroke-opacity: 0.7 !important;
-            stroke-width: 2px !important;
-        }
-        
         /* 桥梁节点标签 - 更醒目 */
         .bridge-label {
             font-weight: bold !important;
@@ -117,6 +175,9 @@ D3_TEMPLATE = """
             fill: #fef3c7 !important;
         }
         
+        /* 大图模式：关闭逐帧开销较大的过渡和动画 */
+        .large-graph .bridge-node .bridge-glow { animation: none; }
+        
         /* 滚动条 */
         ::-webkit-scrollbar { width: 4px; }
         ::-webkit-scrollbar-thumb { background: #475569; border-radius: 2px; }
@@ -196,14 +257,146 @@ D3_TEMPLATE = """
     <!-- 绘图容器 -->
     <div id="graph"></div>
 
-    <script>
-        const data = __GRAPH_DATA__;
-        const config = __NODE_CONFIG__;
+    <script type="module">
+        // 体积较大的数据由服务端 gzip + base64 编码为字符串，这里用浏览器内置的 DecompressionStream 解压；
+        // 较小的数据直接以 JSON 对象内联
+        async function decodePayload(value) {
+            if (typeof value !== "string") return value;
+            const bytes = Uint8Array.from(atob(value), c => c.charCodeAt(0));
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+            return await new Response(stream).json();
+        }
+
+        // 服务端以列式 (SoA) 结构下发图数据，这里还原出 D3 需要的节点/连线对象；
+        // 连线端点下标保留在类型化数组中，供 canvas 绘制的内层循环直接使用
+        const packed = await decodePayload(__GRAPH_DATA__);
+        // 节点配置数组（下标即节点类型编号），热路径按下标取值；按类型名查询时使用 config
+        const nodeConfig = __NODE_CONFIG__;
+        const config = Object.fromEntries(nodeConfig.map(c => [c.type, c]));
+        // 详情面板用到的状态先声明：节点点击处理在面板数据解压完成前就已生效，
+        // 文档-实体映射及其倒排索引在下方解压后再填入
+        let docEntityMap = {}, entityToDocs = {};
+        // 已构建的详情面板 HTML（节点 id -> HTML）
+        const panelCache = new Map();
+        // 模块脚本中的函数不是全局的，面板关闭按钮的 onclick 需要通过 window 访问
+        window.closePanel = closePanel;
+        const N = packed.ids.length;
+        const linkSrc = Uint32Array.from(packed.source);
+        const linkTgt = Uint32Array.from(packed.target);
+        const linkBridge = Uint8Array.from(packed.isBridge);
+        const nLinks = linkSrc.length;
+        const data = { nodes: new Array(N), links: new Array(nLinks) };
+        for (let i = 0; i < N; i++) {
+            data.nodes[i] = {
+                id: packed.ids[i],
+                label: packed.labelFull[i] ?? packed.ids[i],  // 完整名称仅在与 id 不同时下发
+                shortLabel: packed.labels[i],
+                gi: packed.groups[i],
+                group: nodeConfig[packed.groups[i]].type,
+                degree: packed.degree[i],
+                docCount: packed.docCount[i],
+                count: packed.count[i] || 1,         // 粗化后的合并节点：包含的实体数
+                members: packed.members[i] || null   // 粗化后的合并节点：被合并的实体名
+            };
+        }
+        for (let i = 0; i < nLinks; i++) {
+            data.links[i] = {
+                source: data.nodes[linkSrc[i]],
+                target: data.nodes[linkTgt[i]],
+                isBridge: linkBridge[i] === 1
+            };
+        }
+        // 邻接表（按节点下标），详情面板点击时直接取邻居
+        const adjacency = Array.from({ length: N }, () => []);
+        for (let i = 0; i < nLinks; i++) {
+            adjacency[linkSrc[i]].push(data.nodes[linkTgt[i]]);
+            adjacency[linkTgt[i]].push(data.nodes[linkSrc[i]]);
+        }
+        // 节点坐标的连续副本（x0, y0, x1, y1, ...），每帧从节点对象同步一次
+        const pos = new Float32Array(N * 2);
+
+        // 边数较多时启用大图模式：统一细连线、去掉模糊滤镜、减少碰撞迭代
+        const LARGE_GRAPH = nLinks > 1500;
+        if (LARGE_GRAPH) document.body.classList.add("large-graph");
         const width = window.innerWidth;
         const height = window.innerHeight;
 
+        // 服务端已预计算布局（lx/ly 为 [-1, 1] 坐标量化后的整数）时直接换算为初始坐标
+        // 展开半径随节点数增长（约每个节点 140px 见方），与实时模拟的疏密程度接近
+        const hasLayout = N > 0 && Array.isArray(packed.lx);
+        if (hasLayout) {
+            const spread = Math.max(Math.min(width, height) * 0.4, Math.sqrt(N) * 70) / packed.layoutScale;
+            data.nodes.forEach((n, i) => {
+                n.x = width / 2 + packed.lx[i] * spread;
+                n.y = height / 2 + packed.ly[i] * spread;
+            });
+        }
+
+        // Streamlit 每次重新渲染都会重建 iframe；节点坐标按组件 key 存入 sessionStorage，
+        // 切换过滤条件后保留下来的节点沿用上次的位置（拖拽结果不丢失），全部命中时无需重新模拟，
+        // 只命中一部分时把其余节点放到已恢复邻居旁边，再跑一段短模拟让新节点融入
+        const POSITIONS_KEY = "kg-positions:" + __GRAPH_KEY__;
+        function loadPositions() {
+            try {
+                return JSON.parse(sessionStorage.getItem(POSITIONS_KEY)) || {};
+            } catch (err) {
+                return {};  // 存储不可用（如被浏览器禁用）时退化为不保存
+            }
+        }
+        function savePositions() {
+            try {
+                const saved = loadPositions();  // 合并保存，当前未显示的节点保留原位置
+                data.nodes.forEach(n => { saved[n.id] = [Math.round(n.x), Math.round(n.y)]; });
+                sessionStorage.setItem(POSITIONS_KEY, JSON.stringify(saved));
+            } catch (err) { /* 忽略：超出配额或存储不可用 */ }
+        }
+        const savedPositions = loadPositions();
+        let restoredCount = 0;
+        data.nodes.forEach(n => {
+            const p = savedPositions[n.id];
+            if (p) { n.x = p[0]; n.y = p[1]; n.restored = true; restoredCount++; }
+        });
+        const partialRestore = restoredCount > 0 && restoredCount < N;
+        if (partialRestore) {
+            data.nodes.forEach((n, i) => {
+                if (n.restored) return;
+                const placed = adjacency[i].filter(m => m.restored);
+                // 没有已恢复的邻居：有服务端布局时沿用其坐标，否则放到视口中心附近
+                if (placed.length === 0 && hasLayout) return;
+                const cx = placed.length ? d3.mean(placed, m => m.x) : width / 2;
+                const cy = placed.length ? d3.mean(placed, m => m.y) : height / 2;
+                n.x = cx + (Math.random() - 0.5) * 60;
+                n.y = cy + (Math.random() - 0.5) * 60;
+            });
+        }
+        data.nodes.forEach(n => { delete n.restored; });
+        // 已有确定的初始坐标：全部节点都恢复了上次的位置，或未恢复任何节点时直接用服务端布局
+        const settled = N > 0 && (restoredCount === N || (hasLayout && restoredCount === 0));
+        // 部分恢复时以较低的初始 alpha 模拟，已恢复的节点基本保持原位
+        const startAlpha = partialRestore ? 0.3 : 1;
+
+        // 连线画在单个 canvas 上：每帧按样式分批各绘制一次，替代成百上千个 <line> DOM 节点
+        const dpr = window.devicePixelRatio || 1;
+        const canvas = d3.select("#graph").append("canvas")
+            .attr("width", width * dpr)
+            .attr("height", height * dpr)
+            .style("width", width + "px")
+            .style("height", height + "px")
+            .style("pointer-events", "none")
+            .node();
+        const ctx = canvas.getContext("2d");
+        let viewTransform = d3.zoomIdentity;
+        let focusMask = null;  // 详情面板打开时：当前节点及其邻居为 1（按节点下标）
+
         // 创建 zoom 实例并保存引用
-        const zoom = d3.zoom().scaleExtent([0.1, 8]).on("zoom", (e) => g.attr("transform", e.transform));
+        const zoom = d3.zoom().scaleExtent([0.1, 8]).on("zoom", (e) => {
+            g.attr("transform", e.transform);
+            viewTransform = e.transform;
+            svg.classed("lod-no-label", e.transform.k < 0.5)
+               .classed("lod-no-halo", e.transform.k < 0.25);
+            viewDirty = true;
+            requestRender(false);
+        });
         
         const svg = d3.select("#graph").append("svg")
             .attr("width", "100%")
@@ -228,53 +421,214 @@ D3_TEMPLATE = """
 
         const g = svg.append("g");
 
-        // 辅助函数：计算桥梁节点的额外半径
+        // 辅助函数：计算桥梁节点（及合并节点）的额外半径
         function getBridgeBonus(d) {
             if (d.group === "document") return 0;
             const docCount = d.docCount || 0;
-            if (docCount >= 3) return 12;  // 连接3+文献：大幅增大
-            if (docCount >= 2) return 8;   // 连接2文献：中等增大
-            return 0;
+            // 合并节点按包含的实体数适当放大
+            const mergedBonus = (d.count || 1) > 1 ? Math.min(Math.round(Math.sqrt(d.count) * 3), 12) : 0;
+            if (docCount >= 3) return 12 + mergedBonus;  // 连接3+文献：大幅增大
+            if (docCount >= 2) return 8 + mergedBonus;   // 连接2文献：中等增大
+            return mergedBonus;
         }
 
-        // [修改] 力导向模拟 - 优化布局逻辑
-        const simulation = d3.forceSimulation(data.nodes)
-            .force("link", d3.forceLink(data.links).id(d => d.id).distance(d => {
-                // 策略：差异化连线长度
-                // 1. 桥梁边 (isBridge=true) 设长 (180)，让文献簇之间保持距离
-                // 2. 普通边设短 (60)，让它们紧贴所属文献
-                return d.isBridge ? 180 : 60;
-            }))
-            .force("charge", d3.forceManyBody().strength(d => {
-                // 策略：增强斥力，防止重叠
-                // 文献节点斥力极大 (-1000)，作为锚点撑开布局
-                if (d.group === 'document') return -1000;
-                // 桥梁节点斥力较大 (-400)
-                if ((d.docCount || 0) >= 2) return -400;
-                // 普通节点标准斥力 (-200)
-                return -200;
-            }))
-            .force("center", d3.forceCenter(width / 2, height / 2).strength(0.05)) // 减弱中心引力
-            .force("collide", d3.forceCollide().radius(d => {
-                // 碰撞检测，防止重叠
-                const baseRadius = config[d.group]?.radius || 20;
+        // 以下三个函数主线程与 Web Worker 共用（Worker 源码由 toString() 拼接），
+        // 因此只能引用参数和彼此，不能引用页面中的其他变量
+
+        // 碰撞检测，防止重叠
+        function makeCollide(d3, nodeConfig) {
+            return d3.forceCollide().radius(d => {
+                const baseRadius = nodeConfig[d.gi].radius;
                 const extraSpace = (d.docCount || 0) >= 2 ? 30 : 10;
                 return baseRadius + getBridgeBonus(d) + extraSpace;
-            }).iterations(3))
-            .force("x", d3.forceX(width / 2).strength(0.01))
-            .force("y", d3.forceY(height / 2).strength(0.01));
-        // 注意：移除了原本的 .force("bridgeCenter", ...)
-
-        // [修改] 连线样式优化
-        const link = g.append("g")
-            .selectAll("line")
-            .data(data.links)
-            .join("line")
-            .attr("class", d => d.isBridge ? "link bridge-link" : "link")
-            // 普通边更细(0.8)，桥梁边保持粗细(2.0)
-            .attr("stroke-width", d => d.isBridge ? 2.0 : 0.8)
-            // 普通边透明度大幅降低(0.2)，减少视觉噪音
-            .attr("stroke-opacity", d => d.isBridge ? 0.8 : 0.2);
+            }).iterations(1);
+        }
+
+        // [修改] 力导向模拟 - 优化布局逻辑
+        function buildSimulation(d3, nodes, links, width, height, nodeConfig) {
+            return d3.forceSimulation(nodes)
+                .force("link", d3.forceLink(links).id(d => d.id).distance(d => {
+                    // 策略：差异化连线长度
+                    // 1. 桥梁边 (isBridge=true) 设长 (180)，让文献簇之间保持距离
+                    // 2. 普通边设短 (60)，让它们紧贴所属文献
+                    return d.isBridge ? 180 : 60;
+                }))
+                .force("charge", d3.forceManyBody().strength(d => {
+                    // 策略：增强斥力，防止重叠
+                    // 文献节点斥力极大 (-1000)，作为锚点撑开布局
+                    if (d.group === 'document') return -1000;
+                    // 桥梁节点斥力较大 (-400)
+                    if ((d.docCount || 0) >= 2) return -400;
+                    // 普通节点标准斥力 (-200)
+                    return -200;
+                }).theta(0.9).distanceMax(Math.max(width, height) / 2))  // Barnes-Hut 放宽近似精度并截断远距离斥力
+                .force("center", d3.forceCenter(width / 2, height / 2).strength(0.05)) // 减弱中心引力
+                .force("collide", makeCollide(d3, nodeConfig))
+                .force("x", d3.forceX(width / 2).strength(0.01))
+                .force("y", d3.forceY(height / 2).strength(0.01))
+                // 更快收敛：约 60 tick 内稳定，而不是默认的 300 tick
+                .alphaDecay(0.05)
+                .velocityDecay(0.4);
+        }
+
+        // 拖拽 / 停止指令，主线程模拟与 Worker 内模拟使用同一套消息
+        function handleSimulationMessage(simulation, nodes, msg) {
+            const n = nodes[msg.index];
+            if (msg.type === "dragstart") {
+                if (!msg.active) simulation.alphaTarget(0.3).restart();
+                n.fx = msg.x; n.fy = msg.y;
+            } else if (msg.type === "drag") {
+                n.fx = msg.x; n.fy = msg.y;
+            } else if (msg.type === "dragend") {
+                if (!msg.active) simulation.alphaTarget(0);
+                n.fx = null; n.fy = null;
+            } else if (msg.type === "stop") {
+                simulation.stop();
+            }
+        }
+
+        // 补齐缺失的初始坐标；静态布局只做一次同步的碰撞松弛（不引入其他力），保持服务端布局的整体形状
+        const relax = d3.forceSimulation(data.nodes).stop();
+        if (hasLayout && restoredCount === 0) relax.force("collide", makeCollide(d3, nodeConfig)).tick(20);
+
+        // 力导向计算放到 Web Worker 中，主线程只负责绘制和交互；
+        // Worker 不可用（创建失败或加载 d3 失败）时回退到主线程模拟
+        function startWorkerSimulation() {
+            const d3Src = document.querySelector('script[src*="d3"]').src;
+            const source = [
+                `importScripts(${JSON.stringify(d3Src)});`,
+                getBridgeBonus, makeCollide, buildSimulation, handleSimulationMessage,
+                `let simulation, nodes;
+                onmessage = (e) => {
+                    const msg = e.data;
+                    if (msg.type !== "init") { handleSimulationMessage(simulation, nodes, msg); return; }
+                    nodes = msg.nodes;
+                    const links = msg.links.map(([s, t, isBridge]) => ({ source: nodes[s], target: nodes[t], isBridge }));
+                    simulation = buildSimulation(d3, nodes, links, msg.width, msg.height, msg.nodeConfig)
+                        .on("tick", () => {
+                            const buf = new Float32Array(nodes.length * 2);
+                            nodes.forEach((n, i) => { buf[2 * i] = n.x; buf[2 * i + 1] = n.y; });
+                            postMessage({ type: "tick", buf }, [buf.buffer]);
+                        })
+                        .on("end", () => postMessage({ type: "end" }));
+                    if (msg.settled) simulation.alpha(0).stop();
+                    else simulation.alpha(msg.startAlpha);
+                };`
+            ].join("\\n");
+            const url = URL.createObjectURL(new Blob([source], { type: "application/javascript" }));
+            const worker = new Worker(url);
+            URL.revokeObjectURL(url);
+
+            worker.onmessage = (e) => {
+                const msg = e.data;
+                if (msg.type === "tick") {
+                    const buf = msg.buf;
+                    data.nodes.forEach((n, i) => { n.x = buf[2 * i]; n.y = buf[2 * i + 1]; });
+                    requestRender();
+                } else if (msg.type === "end") {
+                    onSimulationEnd();
+                }
+            };
+            worker.onerror = (e) => {
+                e.preventDefault();
+                worker.terminate();
+                engine = startLocalSimulation();
+            };
+            worker.postMessage({
+                type: "init",
+                nodes: data.nodes.map(n => ({ id: n.id, gi: n.gi, group: n.group, docCount: n.docCount, count: n.count, x: n.x, y: n.y })),
+                links: data.links.map((l, i) => [linkSrc[i], linkTgt[i], l.isBridge]),
+                width, height, nodeConfig,
+                settled, startAlpha
+            });
+            return { post: msg => worker.postMessage(msg) };
+        }
+
+        function startLocalSimulation() {
+            const simulation = buildSimulation(d3, data.nodes, data.links, width, height, nodeConfig)
+                .on("tick", () => requestRender())
+                .on("end", onSimulationEnd);
+            if (settled) simulation.alpha(0).stop();
+            else simulation.alpha(startAlpha);
+            return { post: msg => handleSimulationMessage(simulation, data.nodes, msg) };
+        }
+
+        function onSimulationEnd() {
+            savePositions();
+        }
+
+        let engine = null;
+        try {
+            engine = startWorkerSimulation();
+        } catch (err) {
+            engine = startLocalSimulation();
+        }
+
+        // 模拟运行一段时间后强制停止，避免空闲时持续占用 CPU
+        let stopTimer = null;
+        function scheduleStop(delay = 3000) {
+            clearTimeout(stopTimer);
+            stopTimer = setTimeout(() => {
+                engine.post({ type: "stop" });
+                onSimulationEnd();
+            }, delay);
+        }
+
+        // [修改] 连线样式：普通边细而淡，桥梁边（桥梁节点-文献）金色加粗，选中节点的关联边高亮
+        const LINK_STYLES = {
+            normal:    { color: "#334155", alpha: 0.4, width: LARGE_GRAPH ? 1 : 0.8 },
+            bridge:    { color: "#fbbf24", alpha: 0.7, width: 2 },
+            highlight: { color: "#fcd34d", alpha: 1, width: 2 }
+        };
+
+        const BUCKET_NORMAL = 0, BUCKET_BRIDGE = 1, BUCKET_HIGHLIGHT = 2, BUCKET_DIMMED = 3, BUCKET_DIMMED_BRIDGE = 4, BUCKET_CULLED = 5;
+        const linkBucket = new Uint8Array(nLinks);
+
+        function drawLinks() {
+            ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+            ctx.clearRect(0, 0, width, height);
+            ctx.translate(viewTransform.x, viewTransform.y);
+            ctx.scale(viewTransform.k, viewTransform.k);
+
+            // 按样式分桶（桶号写入类型化数组），每个桶只 stroke 一次；两端都在视口同一侧之外的连线直接剔除
+            const { xMin, yMin, xMax, yMax } = viewBounds;
+            for (let i = 0; i < nLinks; i++) {
+                const sx = pos[linkSrc[i] * 2], sy = pos[linkSrc[i] * 2 + 1];
+                const tx = pos[linkTgt[i] * 2], ty = pos[linkTgt[i] * 2 + 1];
+                if ((sx < xMin && tx < xMin) || (sx > xMax && tx > xMax) ||
+                    (sy < yMin && ty < yMin) || (sy > yMax && ty > yMax)) {
+                    linkBucket[i] = BUCKET_CULLED;
+                    continue;
+                }
+                const inFocus = !focusMask || (focusMask[linkSrc[i]] === 1 && focusMask[linkTgt[i]] === 1);
+                if (linkBridge[i]) linkBucket[i] = inFocus ? BUCKET_BRIDGE : BUCKET_DIMMED_BRIDGE;
+                else if (!inFocus) linkBucket[i] = BUCKET_DIMMED;
+                else linkBucket[i] = focusMask ? BUCKET_HIGHLIGHT : BUCKET_NORMAL;
+            }
+
+            const stroke = (bucket, style, alphaScale) => {
+                let any = false;
+                ctx.beginPath();
+                for (let i = 0; i < nLinks; i++) {
+                    if (linkBucket[i] !== bucket) continue;
+                    const s = linkSrc[i] * 2, t = linkTgt[i] * 2;
+                    ctx.moveTo(pos[s], pos[s + 1]);
+                    ctx.lineTo(pos[t], pos[t + 1]);
+                    any = true;
+                }
+                if (!any) return;
+                ctx.strokeStyle = style.color;
+                ctx.globalAlpha = style.alpha * alphaScale;
+                ctx.lineWidth = style.width;
+                ctx.stroke();
+            };
+            stroke(BUCKET_DIMMED, LINK_STYLES.normal, 0.05);
+            stroke(BUCKET_DIMMED_BRIDGE, LINK_STYLES.bridge, 0.05);
+            stroke(BUCKET_NORMAL, LINK_STYLES.normal, 1);
+            stroke(BUCKET_HIGHLIGHT, LINK_STYLES.highlight, 1);
+            stroke(BUCKET_BRIDGE, LINK_STYLES.bridge, 1);
+            ctx.globalAlpha = 1;
+        }
 
         // 节点组 - 为桥梁节点添加特殊类
         const node = g.append("g")
@@ -290,46 +644,44 @@ D3_TEMPLATE = """
                 .on("drag", dragged)
                 .on("end", dragended))
             .on("click", (e, d) => showDetails(d));
+        const nodeEls = node.nodes();  // 按节点下标取 DOM 元素
+        let focusedEls = [];
 
         // 桥梁节点外层发光效果
         node.filter(d => (d.docCount || 0) >= 2)
             .append("circle")
             .attr("class", "bridge-glow")
-            .attr("r", d => (config[d.group]?.radius || 10) + getBridgeBonus(d) + 10)
+            .attr("r", d => nodeConfig[d.gi].radius + getBridgeBonus(d) + 10)
             .attr("fill", "#fbbf24")
             .attr("opacity", 0.3)
-            .attr("filter", "url(#bridgeGlow)");
+            .attr("filter", LARGE_GRAPH ? null : "url(#bridgeGlow)");
 
         // 节点光晕
         node.append("circle")
             .attr("class", "halo")
-            .attr("r", d => (config[d.group]?.radius || 10) + getBridgeBonus(d) + 4)
-            .attr("fill", d => (d.docCount || 0) >= 2 ? "#fbbf24" : (config[d.group]?.color || "#ccc"))
+            .attr("r", d => nodeConfig[d.gi].radius + getBridgeBonus(d) + 4)
+            .attr("fill", d => (d.docCount || 0) >= 2 ? "#fbbf24" : nodeConfig[d.gi].color)
             .attr("opacity", d => (d.docCount || 0) >= 2 ? 0.4 : 0.2);
 
         // 节点实体 - 桥梁节点更大
         node.append("circle")
-            .attr("r", d => (config[d.group]?.radius || 10) + getBridgeBonus(d))
-            .attr("fill", d => config[d.group]?.color || "#ccc")
+            .attr("r", d => nodeConfig[d.gi].radius + getBridgeBonus(d))
+            .attr("fill", d => nodeConfig[d.gi].color)
             .attr("stroke", d => (d.docCount || 0) >= 2 ? "#fbbf24" : "#fff")
             .attr("stroke-width", d => (d.docCount || 0) >= 2 ? 3 : 1.5);
 
         // 节点图标
         node.append("text")
-            .text(d => config[d.group]?.icon || "")
+            .text(d => nodeConfig[d.gi].icon)
             .attr("dy", "0.35em")
             .attr("text-anchor", "middle")
-            .style("font-size", d => (((config[d.group]?.radius || 10) + getBridgeBonus(d)) * 0.7) + "px");
+            .style("font-size", d => ((nodeConfig[d.gi].radius + getBridgeBonus(d)) * 0.7) + "px");
 
         // [修改] 标签显示策略
         node.append("text")
-            .attr("class", d => (d.docCount || 0) >= 2 ? "bridge-label" : "")
-            .text(d => {
-                // 桥梁节点显示更长的名字
-                const maxLen = (d.docCount || 0) >= 2 ? 30 : 15;
-                return d.label.length > maxLen ? d.label.substring(0, maxLen) + "..." : d.label;
-            })
-            .attr("x", d => (config[d.group]?.radius || 10) + getBridgeBonus(d) + 8)
+            .attr("class", d => (d.docCount || 0) >= 2 ? "node-label bridge-label" : "node-label")
+            .text(d => d.shortLabel)  // 服务端已截断（桥梁节点显示更长的名字）
+            .attr("x", d => nodeConfig[d.gi].radius + getBridgeBonus(d) + 8)
             .attr("y", 4)
             .attr("fill", d => (d.docCount || 0) >= 2 ? "#fef3c7" : "#cbd5e1") // 普通文字调暗
             .style("text-shadow", "0 1px 4px rgba(0,0,0,0.9)")
@@ -337,55 +689,129 @@ D3_TEMPLATE = """
             .style("font-size", d => (d.docCount || 0) >= 2 ? "12px" : "10px") // 普通文字变小
             .style("pointer-events", "none");
 
-        simulation.on("tick", () => {
-            link
-                .attr("x1", d => d.source.x)
-                .attr("y1", d => d.source.y)
-                .attr("x2", d => d.target.x)
-                .attr("y2", d => d.target.y);
-            node
-                .attr("transform", d => `translate(${d.x},${d.y})`);
-        });
+        // tick 只标记脏位，实际 DOM/canvas 写入合并到下一个动画帧，每帧至多一次
+        let rafId = null;
+        let nodesDirty = false;
+        let viewDirty = true;
+        function requestRender(moveNodes = true) {
+            nodesDirty = nodesDirty || moveNodes;
+            if (rafId === null) rafId = requestAnimationFrame(ticked);
+        }
+
+        // 视口剔除：当前缩放/平移下可见区域（图坐标，外扩一圈余量），视口外的节点不显示也不更新 transform
+        const CULL_MARGIN = 100;  // 覆盖最大节点半径及部分标签长度，避免边缘处突然消失
+        const viewBounds = { xMin: 0, yMin: 0, xMax: 0, yMax: 0 };
+        function updateViewBounds() {
+            const { k, x, y } = viewTransform;
+            viewBounds.xMin = -x / k - CULL_MARGIN;
+            viewBounds.yMin = -y / k - CULL_MARGIN;
+            viewBounds.xMax = (width - x) / k + CULL_MARGIN;
+            viewBounds.yMax = (height - y) / k + CULL_MARGIN;
+        }
+
+        function ticked() {
+            rafId = null;
+            const moved = nodesDirty;
+            if (moved) {
+                for (let i = 0; i < N; i++) {
+                    pos[2 * i] = data.nodes[i].x;
+                    pos[2 * i + 1] = data.nodes[i].y;
+                }
+            }
+            if (moved || viewDirty) {
+                updateViewBounds();
+                const { xMin, yMin, xMax, yMax } = viewBounds;
+                node.each(function (d) {
+                    const visible = d.x > xMin && d.x < xMax && d.y > yMin && d.y < yMax;
+                    if (visible !== d.visible) {
+                        d.visible = visible;
+                        this.style.display = visible ? "" : "none";
+                        if (visible) this.setAttribute("transform", `translate(${d.x},${d.y})`);
+                    } else if (visible && moved) {
+                        this.setAttribute("transform", `translate(${d.x},${d.y})`);
+                    }
+                });
+            }
+            nodesDirty = false;
+            viewDirty = false;
+            drawLinks();
+        }
+        // 首帧直接绘制；有静态布局时不做动画，拖拽时才重新启动模拟
+        nodesDirty = true;
+        ticked();
+        if (settled) {
+            savePositions();
+        } else {
+            scheduleStop();
+        }
 
         function dragstarted(event, d) {
-            if (!event.active) simulation.alphaTarget(0.3).restart();
-            d.fx = d.x; d.fy = d.y;
+            clearTimeout(stopTimer);
+            engine.post({ type: "dragstart", index: d.index, x: d.x, y: d.y, active: event.active });
+        }
+        function dragged(event, d) {
+            engine.post({ type: "drag", index: d.index, x: event.x, y: event.y });
         }
-        function dragged(event, d) { d.fx = event.x; d.fy = event.y; }
         function dragended(event, d) {
-            if (!event.active) simulation.alphaTarget(0);
-            d.fx = null; d.fy = null;
+            engine.post({ type: "dragend", index: d.index, active: event.active });
+            scheduleStop();
+        }
+
+        // 文档-实体映射及其倒排索引（实体 -> 来源文献），由服务端一次性构建；
+        // 解压期间点开的面板不含来源信息，数据就绪后清空缓存重新构建
+        [docEntityMap, entityToDocs] = await Promise.all([
+            decodePayload(__DOC_ENTITY_MAP__),
+            decodePayload(__ENTITY_TO_DOCS__)
+        ]);
+        panelCache.clear();
+
+        // 变暗/高亮通过类切换实现：只改动上一次和本次聚焦的节点，不逐个写全部节点的 style
+        function setFocus(focusNodes) {
+            focusedEls.forEach(el => el.classList.remove("focused"));
+            focusedEls = focusNodes ? focusNodes.map(n => nodeEls[n.index]) : [];
+            focusedEls.forEach(el => el.classList.add("focused"));
+            svg.classed("focus-mode", focusNodes !== null);
         }
 
         // 详情面板逻辑
         function showDetails(d) {
             const panel = document.getElementById('details-panel');
-            const docEntityMap = __DOC_ENTITY_MAP__;
             
             document.getElementById('panel-type').innerText = config[d.group]?.label || "ENTITY";
             document.getElementById('panel-type').style.color = config[d.group]?.color;
             document.getElementById('panel-title').innerText = d.label;
             
-            const connectedIds = new Set();
-            connectedIds.add(d.id);
-            const connectedNodes = [];
+            // 邻接表 O(degree) 取邻居，无需扫描全部连线
+            focusMask = new Uint8Array(N);
+            focusMask[d.index] = 1;
+            adjacency[d.index].forEach(n => { focusMask[n.index] = 1; });
+
+            setFocus([d, ...adjacency[d.index]]);
+            requestRender(false);
+
+            // 详情内容只取决于节点本身（页面内数据不变），首次点击时构建并缓存
+            let content = panelCache.get(d.id);
+            if (content === undefined) {
+                content = buildPanelContent(d);
+                panelCache.set(d.id, content);
+            }
             
-            data.links.forEach(l => {
-                if(l.source.id === d.id) {
-                    connectedIds.add(l.target.id);
-                    connectedNodes.push(data.nodes.find(n => n.id === l.target.id));
-                }
-                if(l.target.id === d.id) {
-                    connectedIds.add(l.source.id);
-                    connectedNodes.push(data.nodes.find(n => n.id === l.source.id));
-                }
-            });
+            document.getElementById('panel-content').innerHTML = content;
+            panel.classList.add('open');
+            event.stopPropagation();
+        }
 
-            node.style("opacity", n => connectedIds.has(n.id) ? 1 : 0.1);
-            link.style("opacity", l => (connectedIds.has(l.source.id) && connectedIds.has(l.target.id)) ? 1 : 0.05);
-            link.classed("highlighted", l => (connectedIds.has(l.source.id) && connectedIds.has(l.target.id)));
+        // 按实体/文献名查映射：只取自有属性，避免 "constructor" 等名称命中 Object.prototype 上的成员
+        function lookup(map, ...keys) {
+            for (const key of keys) {
+                if (Object.hasOwn(map, key)) return map[key];
+            }
+            return undefined;
+        }
 
-            // 构建详情内容
+        // 构建详情面板 HTML
+        function buildPanelContent(d) {
+            const connectedNodes = adjacency[d.index];
             let content = `<div style="margin-bottom:15px;">
                 <span style="background:#334155; padding:2px 8px; border-radius:4px; font-size:11px;">连接数: ${d.degree}</span>
                 <span style="background:${config[d.group]?.color}30; color:${config[d.group]?.color}; padding:2px 8px; border-radius:4px; font-size:11px; margin-left:6px;">${config[d.group]?.label}</span>
@@ -404,7 +830,7 @@ D3_TEMPLATE = """
             // 根据节点类型显示不同内容
             if (d.group === 'document') {
                 content += `<p style="color:#94a3b8; font-size:12px; margin-bottom:12px;">${typeDescriptions['document']}</p>`;
-                const docEntities = docEntityMap[d.label] || docEntityMap[d.id] || {};
+                const docEntities = lookup(docEntityMap, d.label, d.id) || {};
                 
                 // 显示该文献包含的实体概要
                 let entitySummary = [];
@@ -436,21 +862,18 @@ D3_TEMPLATE = """
                     <div style="color:#e2e8f0; font-size:12px; line-height:1.5;">${typeDescriptions[d.group] || '这是从文献中提取的实体。'}</div>
                 </div>`;
                 
-                // 查找来源文献
-                const sourceDocs = [];
-                for (const [docName, entities] of Object.entries(docEntityMap)) {
-                    const allEntities = [
-                        ...(entities.keywords || []),
-                        ...(entities.methods || []),
-                        ...(entities.datasets || []),
-                        ...(entities.fields || []),
-                        ...(entities.applications || [])
-                    ];
-                    if (allEntities.includes(d.label) || allEntities.includes(d.id)) {
-                        sourceDocs.push(docName);
-                    }
+                // 粗化后的合并节点：列出被合并的实体
+                if (d.members) {
+                    content += `<div style="margin-bottom:12px;">
+                        <div style="color:#94a3b8; font-size:12px; margin-bottom:8px;">🧩 <strong>合并的实体 (${d.members.length}个):</strong></div>
+                        <div style="color:#e2e8f0; font-size:12px; line-height:1.5; word-break:break-word;">${d.members.join(', ')}</div>
+                    </div>`;
                 }
                 
+                // 查找来源文献（倒排索引，O(1) 查询）；合并节点不在索引中，改用其相邻的文献节点
+                const sourceDocs = lookup(entityToDocs, d.label, d.id)
+                    || adjacency[d.index].filter(n => n.group === 'document').map(n => n.label);
+                
                 if (sourceDocs.length > 0) {
                     content += `<div style="margin-bottom:12px;">
                         <div style="color:#94a3b8; font-size:12px; margin-bottom:8px;">📄 <strong>来源文献 (${sourceDocs.length}篇):</strong></div>
@@ -464,10 +887,10 @@ D3_TEMPLATE = """
                     if (sourceDocs.length > 0) {
                         const coOccurring = {}; // {实体类型: Set<实体名>}
                         sourceDocs.forEach(docName => {
-                            const entities = docEntityMap[docName] || {};
+                            const entities = lookup(docEntityMap, docName) || {};
                             ['keywords', 'methods', 'datasets'].forEach(type => {
                                 (entities[type] || []).forEach(e => {
-                                    if (e !== d.label && e !== d.id) {
+                                    if (e !== d.label && e !== d.id && !d.members?.includes(e)) {
                                         const typeKey = type.slice(0, -1); // 'keywords' -> 'keyword'
                                         if (!coOccurring[typeKey]) coOccurring[typeKey] = new Set();
                                         coOccurring[typeKey].add(e);
@@ -567,15 +990,14 @@ D3_TEMPLATE = """
                 }
             }
             
-            document.getElementById('panel-content').innerHTML = content;
-            panel.classList.add('open');
-            event.stopPropagation();
+            return content;
         }
 
         function closePanel() {
             document.getElementById('details-panel').classList.remove('open');
-            node.style("opacity", 1);
-            link.style("opacity", 1).classed("highlighted", false);
+            setFocus(null);
+            focusMask = null;
+            requestRender(false);
         }
 
         svg.on("click", (e) => {
@@ -598,6 +1020,21 @@ D3_TEMPLATE = """
 """
 
 
+# 模板中与调用无关的部分（节点配置表）在导入时预先填入，渲染时只替换动态数据
+_D3_PAGE_TEMPLATE = D3_TEMPLATE.replace("__NODE_CONFIG__", _NODE_CONFIG_JSON)
+
+# 每次渲染需要填充的占位符；不会误替换已注入数据中恰好包含的占位符文本
+_PLACEHOLDER_RE = re.compile(
+    "(__(?:GRAPH_DATA|GRAPH_KEY|NODE_COUNT|EDGE_COUNT|LEGEND_HTML|DOC_ENTITY_MAP|ENTITY_TO_DOCS)__)"
+)
+
+# 导入时按占位符把模板切分好：偶数下标为静态片段，奇数下标为占位符名，
+# 渲染时只需一次 "".join，不再扫描模板
+_D3_PAGE_PARTS = _PLACEHOLDER_RE.split(_D3_PAGE_TEMPLATE)
+
+# 详情面板中参与来源文献查询的实体字段
+_DOC_ENTITY_FIELDS = ("keywords", "methods", "datasets", "fields", "applications")
+
 def find_bridging_entity_types(nx_graph: nx.Graph) -> list:
     """
     查找连接2个或以上文献节点的实体类型
@@ -640,23 +1077,182 @@ def find_bridging_entity_types(nx_graph: nx.Graph) -> list:
     return list(bridging_types)
 
 
+def _maybe_downsample(nx_graph: nx.Graph, max_nodes: int = MAX_RENDER_NODES) -> nx.Graph:
+    """
+    节点数超过上限时，只保留 degree 最高的节点及其诱导子图
+    
+    文档节点始终保留，剩余名额按 degree 分配给实体节点。
+    
+    Args:
+        nx_graph: NetworkX 图
+        max_nodes: 保留的节点数上限
+        
+    Returns:
+        原图（未超限时）或裁剪后的子图副本
+    """
+    if nx_graph.number_of_nodes() <= max_nodes:
+        return nx_graph
+    
+    doc_ids = [n for n, t in nx_graph.nodes(data="node_type") if t == "document"]
+    deg = dict(nx_graph.degree())
+    for doc_id in doc_ids:
+        deg.pop(doc_id, None)
+    
+    budget = max(max_nodes - len(doc_ids), 0)
+    top = set(heapq.nlargest(budget, deg, key=deg.get))
+    top.update(doc_ids)
+    return nx_graph.subgraph(top).copy()
+
+
+def _coarsen(nx_graph: nx.Graph, max_nodes: int = MAX_RENDER_NODES) -> nx.Graph:
+    """
+    节点数超过上限时粗化图谱：同类型且邻居集合完全相同的实体合并为一个节点
+    
+    先合并只连接一篇文献的叶子实体（即按 文献 + 类型 分组），仍超限时再合并
+    其余邻居集合相同的实体；合并节点带 count（实体数）和 members（实体名）属性。
+    粗化后仍超限则交给 _maybe_downsample 按 degree 裁剪。
+    
+    Args:
+        nx_graph: NetworkX 图
+        max_nodes: 节点数上限
+        
+    Returns:
+        原图（未超限时）或粗化后的新图
+    """
+    if nx_graph.number_of_nodes() <= max_nodes:
+        return nx_graph
+    
+    groups = defaultdict(list)
+    for node_id, node_type in nx_graph.nodes(data="node_type"):
+        if node_type != "document":
+            groups[(node_type, frozenset(nx_graph.neighbors(node_id)))].append(node_id)
+    
+    coarse = nx_graph.copy()
+    for leaves_only in (True, False):
+        for (node_type, neighbors), members in groups.items():
+            if len(members) < 2 or (len(neighbors) == 1) != leaves_only:
+                continue
+            
+            merged_id = f"{members[0]} 等{len(members)}项"
+            attrs = dict(nx_graph.nodes[members[0]])
+            attrs.update(label=merged_id, node_type=node_type, count=len(members), members=[str(m) for m in members])
+            edges = [(merged_id, nb, dict(nx_graph.edges[members[0], nb])) for nb in neighbors]
+            
+            coarse.remove_nodes_from(members)
+            coarse.add_node(merged_id, **attrs)
+            coarse.add_edges_from(edges)
+        
+        if coarse.number_of_nodes() <= max_nodes:
+            break
+    
+    return _maybe_downsample(coarse, max_nodes)
+
+
+def _graph_signature(nx_graph: nx.Graph) -> tuple:
+    """
+    计算图结构的廉价签名，用作缓存键（节点/边数 + 无向边集合哈希）
+    """
+    return (
+        nx_graph.number_of_nodes(),
+        nx_graph.number_of_edges(),
+        hash(frozenset(frozenset((str(u), str(v))) for u, v in nx_graph.edges()))
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_layout(_nx_graph: nx.Graph, graph_signature: tuple) -> Dict[str, Tuple[float, float]]:
+    """
+    在服务端预计算整张图的力导向布局，浏览器端直接使用静态坐标
+    
+    每张图只计算一次：各种过滤条件下显示的节点都从这份布局中取坐标，切换过滤条件不会重新布局，
+    不同视图之间的位置也保持一致。节点过多时在粗化后的图上计算，被合并的实体取合并节点的坐标，
+    被裁掉的节点取已布局邻居的中心。
+    _nx_graph 不参与哈希，缓存键由 graph_signature 决定。
+    
+    Args:
+        _nx_graph: NetworkX 图（完整图）
+        graph_signature: _graph_signature 的结果
+        
+    Returns:
+        {node_id: (x, y)}，坐标归一化到 [-1, 1]；无法计算时返回空字典（前端回退为实时模拟）
+    """
+    graph = _coarsen(_nx_graph)
+    if graph.number_of_nodes() == 0:
+        return {}
+    
+    try:
+        pos = nx.spring_layout(graph, iterations=200, seed=42)
+    except ImportError:
+        # spring_layout 依赖 numpy（500 个节点以上还需要 scipy）
+        return {}
+    
+    positions = {str(n): (float(x), float(y)) for n, (x, y) in pos.items()}
+    
+    # 粗化时被合并的实体沿用合并节点的坐标
+    for node_id, members in graph.nodes(data="members"):
+        for member in members or ():
+            positions.setdefault(member, positions[str(node_id)])
+    
+    # 粗化时被裁掉的节点放在已布局邻居的中心
+    for node_id in _nx_graph.nodes():
+        key = str(node_id)
+        if key in positions:
+            continue
+        placed = [positions[str(nb)] for nb in _nx_graph.neighbors(node_id) if str(nb) in positions]
+        if placed:
+            positions[key] = (sum(p[0] for p in placed) / len(placed), sum(p[1] for p in placed) / len(placed))
+    
+    return {key: (round(x, 4), round(y, 4)) for key, (x, y) in positions.items()}
+
+
+def _attach_layout(layout_graph: nx.Graph, d3_data: Dict[str, Any], graph_signature: Optional[tuple] = None) -> None:
+    """
+    将预计算的布局坐标写入 D3 节点（lx/ly，归一化坐标）
+    
+    Args:
+        layout_graph: 完整图（布局按整张图计算并缓存）
+        d3_data: 当前视图的 D3 数据，合并节点取其成员坐标的中心
+        graph_signature: layout_graph 的 _graph_signature，为 None 时现算
+    """
+    if graph_signature is None:
+        graph_signature = _graph_signature(layout_graph)
+    positions = compute_layout(layout_graph, graph_signature)
+    
+    coords = []
+    for node in d3_data["nodes"]:
+        pos = positions.get(node["id"])
+        if pos is None and node.get("members"):
+            placed = [positions[m] for m in node["members"] if m in positions]
+            if placed:
+                pos = (sum(p[0] for p in placed) / len(placed), sum(p[1] for p in placed) / len(placed))
+        if pos is None:
+            return  # 有节点缺少坐标时不使用静态布局，前端回退为实时模拟
+        coords.append(pos)
+    
+    for node, (x, y) in zip(d3_data["nodes"], coords):
+        node["lx"], node["ly"] = x, y
+
+
 def nx_graph_to_d3_data(nx_graph: nx.Graph) -> Dict[str, Any]:
     data = {"nodes": [], "links": []}
     if not nx_graph: return data
 
+    degrees = dict(nx_graph.degree())
+
     for node_id, attrs in nx_graph.nodes(data=True):
         data["nodes"].append({
             "id": str(node_id),
             "label": attrs.get("label", str(node_id)),
             "group": attrs.get("node_type", "keyword"),
-            "degree": nx_graph.degree(node_id)
+            "degree": degrees[node_id]
         })
 
-    for u, v, attrs in nx_graph.edges(data=True):
+    # 只取 weight 属性，避免逐边构造完整属性字典
+    for u, v, weight in nx_graph.edges(data="weight", default=1):
         data["links"].append({
             "source": str(u),
             "target": str(v),
-            "value": attrs.get("weight", 1)
+            "value": weight
         })
     return data
 
@@ -669,6 +1265,28 @@ def render_graph_in_streamlit(nx_graph: nx.Graph, height: int = 750, key: str =
     if doc_entity_map is None:
         doc_entity_map = {}
     
+    _render_graph_block(nx_graph, height, key, doc_entity_map)
+
+
+def _rerun_graph_block() -> None:
+    """只重跑图谱区块；不支持局部重运行或不在 fragment 中时整页重跑"""
+    try:
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        st.rerun()
+
+
+@_fragment
+def _render_graph_block(nx_graph: nx.Graph, height: int, key: str, doc_entity_map: Dict[str, Any]) -> None:
+    """
+    图谱过滤器与图谱本体（fragment：过滤器交互只重跑这一区块）
+    
+    Args:
+        nx_graph: NetworkX 图（非空）
+        height: 图谱高度
+        key: 组件 key 前缀
+        doc_entity_map: 文档-实体映射
+    """
     # 节点类型过滤器
     st.markdown("**🎛️ 节点过滤器** - 选择要显示的节点类型")
     
@@ -700,22 +1318,22 @@ def render_graph_in_streamlit(nx_graph: nx.Graph, height: int = 750, key: str =
     with col1:
         if st.button("📄 仅文档", key=f"{key}_only_doc", use_container_width=True):
             st.session_state[filter_key] = ["document"]
-            st.rerun()
+            _rerun_graph_block()
     with col2:
         if st.button("🔗 核心关联", key=f"{key}_core", use_container_width=True):
             st.session_state[filter_key] = ["document", "keyword", "method"]
-            st.rerun()
+            _rerun_graph_block()
     with col3:
         # 新增：显示文献关联按钮 - 找出连接多个文献的实体节点
         if st.button("📎 文献关联", key=f"{key}_doc_links", use_container_width=True):
             # 查找连接2个或以上文献节点的实体
             bridging_types = find_bridging_entity_types(nx_graph)
             st.session_state[filter_key] = ["document"] + bridging_types
-            st.rerun()
+            _rerun_graph_block()
     with col4:
         if st.button("🌐 显示全部", key=f"{key}_show_all", use_container_width=True):
             st.session_state[filter_key] = all_types
-            st.rerun()
+            _rerun_graph_block()
     
     st.markdown("---")
     
@@ -747,36 +1365,245 @@ def render_graph_in_streamlit(nx_graph: nx.Graph, height: int = 750, key: str =
     )
     st.session_state[topn_key] = top_n_limit
     
+    # 过滤 + 布局 + 序列化整体缓存；类型排序后作为键，快捷按钮来回切换时直接命中
+    html_content, merged, omitted = _build_graph_html(
+        nx_graph,
+        _graph_signature(nx_graph),
+        tuple(sorted(selected_types)),
+        top_n_limit,
+        doc_entity_map,
+        key
+    )
+    
     st.caption(f"💡 当前共有 {total_entity_count} 个实体节点，将显示 Degree 最高的 {min(top_n_limit, total_entity_count)} 个")
+    if merged:
+        st.caption("🧩 图谱节点较多，已将邻居完全相同的同类实体合并显示（简化视图），点击合并节点可查看包含的实体")
+    if omitted:
+        st.caption(f"✂️ 节点数超过渲染上限 {MAX_RENDER_NODES}，已省略 Degree 较低的 {omitted} 个实体")
     
     st.markdown("---")
     
-    # 过滤节点和边（带 Top-N 限制）
-    d3_data = nx_graph_to_d3_data_filtered(nx_graph, selected_types, top_n_limit)
-    
-    if not d3_data["nodes"]:
+    if html_content is None:
         st.warning("当前过滤条件下没有节点，请选择更多节点类型。")
         return
     
-    legend_items = ""
-    for k, v in NODE_CONFIG.items():
-        if k in selected_types:
-            legend_items += f"""
-            <div class='legend-item'>
-                <div class='legend-dot' style='background:{v['color']}'></div>
-                <span>{v['label']}</span>
-            </div>
-            """
+    # 直接将 HTML 字符串交给 components.html，热路径上不经过磁盘
+    components.html(html_content, height=height, scrolling=False)
 
-    # 使用 .replace() 替代 .format()，避免与 JS/CSS 中的 { } 冲突
-    html_content = D3_TEMPLATE.replace("__GRAPH_DATA__", json.dumps(d3_data)) \
-                              .replace("__NODE_CONFIG__", json.dumps(NODE_CONFIG)) \
-                              .replace("__NODE_COUNT__", str(len(d3_data["nodes"]))) \
-                              .replace("__EDGE_COUNT__", str(len(d3_data["links"]))) \
-                              .replace("__LEGEND_HTML__", legend_items) \
-                              .replace("__DOC_ENTITY_MAP__", json.dumps(doc_entity_map))
 
-    components.html(html_content, height=height, scrolling=False)
+@st.cache_data(show_spinner=False, max_entries=32)
+def _build_graph_html(_nx_graph: nx.Graph, graph_signature: tuple, selected_types: Tuple[str, ...],
+                      top_n_limit: int, doc_entity_map: Dict[str, Any], graph_key: str) -> Tuple[Optional[str], bool, int]:
+    """
+    过滤节点、附加布局并生成图谱 HTML（按图签名 + 过滤条件缓存）
+    
+    先在原图上按类型和 Top-N 过滤，过滤结果仍超过 MAX_RENDER_NODES 时才粗化。
+    _nx_graph 不参与哈希，由 graph_signature 代表图结构。
+    
+    Args:
+        _nx_graph: NetworkX 图
+        graph_signature: _graph_signature 的结果
+        selected_types: 选中的节点类型（已排序）
+        top_n_limit: 实体节点数量上限
+        doc_entity_map: 文档-实体映射
+        graph_key: 图谱组件 key
+        
+    Returns:
+        (HTML 字符串, 是否合并了节点, 超出上限被省略的节点数)；过滤后没有节点时 HTML 为 None
+    """
+    d3_data = nx_graph_to_d3_data_filtered(_nx_graph, selected_types, top_n_limit)
+    if not d3_data["nodes"]:
+        return None, False, 0
+    
+    filtered_count = len(d3_data["nodes"])
+    if filtered_count > MAX_RENDER_NODES:
+        d3_data = _coarsen_filtered(_nx_graph, d3_data, selected_types)
+    merged = any(node.get("count", 1) > 1 for node in d3_data["nodes"])
+    omitted = filtered_count - sum(node.get("count", 1) for node in d3_data["nodes"])
+    
+    # 服务端预计算布局（整张图只算一次并缓存），浏览器端无需运行完整的力导向模拟
+    _attach_layout(_nx_graph, d3_data, graph_signature)
+    return render_graph_html(d3_data, selected_types, doc_entity_map, graph_key), merged, omitted
+
+
+def _coarsen_filtered(nx_graph: nx.Graph, d3_data: Dict[str, Any], selected_types: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    过滤结果仍超过 MAX_RENDER_NODES 时，只在过滤后的节点上粗化（必要时再按 degree 裁剪）
+    
+    Args:
+        nx_graph: 原图
+        d3_data: nx_graph_to_d3_data_filtered 在原图上的过滤结果
+        selected_types: 选中的节点类型
+        
+    Returns:
+        粗化后重新生成的 D3 数据
+    """
+    raw_ids = {str(n): n for n in nx_graph.nodes()}
+    keep = {raw_ids[node["id"]] for node in d3_data["nodes"]}
+    # 未选中文献时也带上文献节点，使 docCount（桥梁节点判断）与过滤时一致；它们不显示，也不占用上限
+    extra_docs = {n for n, t in nx_graph.nodes(data="node_type") if t == "document"} - keep
+    coarse = _coarsen(nx_graph.subgraph(keep | extra_docs), MAX_RENDER_NODES + len(extra_docs))
+    entity_count = sum(1 for _, t in coarse.nodes(data="node_type") if t != "document")
+    return nx_graph_to_d3_data_filtered(coarse, list(selected_types), entity_count)
+
+
+def _pack_d3_data(d3_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 D3 数据由对象数组 (AoS) 转为列式结构 (SoA)，减小下发的 JSON 体积
+    
+    键名只出现一次；节点类型编码为 NODE_CONFIG 中的下标；
+    连线端点用节点下标表示；布局坐标量化为整数（除以 layoutScale 还原）；
+    标签截断为显示长度，前端不使用的字段（如连线 value）不下发。
+    
+    Args:
+        d3_data: nx_graph_to_d3_data_filtered 的输出（可带 lx/ly 布局坐标）
+        
+    Returns:
+        列式图数据字典
+    """
+    nodes = d3_data["nodes"]
+    links = d3_data["links"]
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    
+    # 标签在服务端按显示长度截断；完整名称与 id 相同时不重复下发
+    labels = []
+    label_full = {}
+    for i, node in enumerate(nodes):
+        label = node["label"]
+        if label != node["id"]:
+            label_full[i] = label
+        max_len = _BRIDGE_LABEL_MAX_LEN if node.get("docCount", 0) >= 2 else _LABEL_MAX_LEN
+        labels.append(label if len(label) <= max_len else label[:max_len] + "...")
+    
+    packed = {
+        "ids": [node["id"] for node in nodes],
+        "labels": labels,
+        "labelFull": label_full,
+        "groups": [_GROUP_INDEX.get(node["group"], _GROUP_INDEX["keyword"]) for node in nodes],
+        "degree": [node["degree"] for node in nodes],
+        "docCount": [node.get("docCount", 0) for node in nodes],
+        # 粗化产生的合并节点才有以下字段，按下标稀疏存储
+        "count": {i: node["count"] for i, node in enumerate(nodes) if node.get("count", 1) > 1},
+        "members": {i: node["members"] for i, node in enumerate(nodes) if node.get("members")},
+        "source": [index[link["source"]] for link in links],
+        "target": [index[link["target"]] for link in links],
+        "isBridge": [1 if link.get("isBridge") else 0 for link in links],
+    }
+    if nodes and all("lx" in node for node in nodes):
+        packed["layoutScale"] = _LAYOUT_SCALE
+        packed["lx"] = [round(node["lx"] * _LAYOUT_SCALE) for node in nodes]
+        packed["ly"] = [round(node["ly"] * _LAYOUT_SCALE) for node in nodes]
+    return packed
+
+
+def _embed_json(obj: Any) -> str:
+    """
+    生成内联到模板中的 JSON 数据
+    
+    体积超过 _COMPRESS_MIN_BYTES 时 gzip 压缩并 base64 编码为 JS 字符串字面量，
+    由前端 decodePayload 解压；较小时直接内联 JSON，省去编码开销。
+    
+    Args:
+        obj: 可 JSON 序列化的对象
+        
+    Returns:
+        可直接替换模板占位符的 JS 表达式
+    """
+    raw = _dumps(obj)
+    if len(raw) < _COMPRESS_MIN_BYTES:
+        return raw
+    # mtime=0：相同数据得到相同输出
+    compressed = gzip.compress(raw.encode("utf-8"), mtime=0)
+    return '"' + base64.b64encode(compressed).decode("ascii") + '"'
+
+
+def render_graph_html(d3_data: Dict[str, Any], selected_types: list, doc_entity_map: Dict[str, Any],
+                      graph_key: str = "knowledge_graph") -> str:
+    """
+    将 D3 数据注入模板，生成完整的图谱 HTML 字符串（不落盘）
+    
+    Args:
+        d3_data: nx_graph_to_d3_data_filtered 的输出
+        selected_types: 当前选中的节点类型（用于生成图例）
+        doc_entity_map: 文档-实体映射，供详情面板查询
+        graph_key: 图谱组件 key，浏览器端按此保存节点位置
+        
+    Returns:
+        HTML 字符串
+    """
+    legend_items = "".join(_LEGEND_ITEM_HTML[k] for k in NODE_CONFIG if k in selected_types)
+
+    subs = {
+        "__GRAPH_DATA__": _embed_json(_pack_d3_data(d3_data)),
+        "__GRAPH_KEY__": _dumps(graph_key),
+        "__NODE_COUNT__": str(len(d3_data["nodes"])),
+        "__EDGE_COUNT__": str(len(d3_data["links"])),
+        "__LEGEND_HTML__": legend_items,
+        "__DOC_ENTITY_MAP__": _embed_json(doc_entity_map),
+        "__ENTITY_TO_DOCS__": _embed_json(_build_entity_to_docs(doc_entity_map)),
+    }
+    # 不使用 .format()，避免与 JS/CSS 中的 { } 冲突；按预切分的片段一次拼接
+    parts = _D3_PAGE_PARTS[:]
+    parts[1::2] = [subs[name] for name in parts[1::2]]
+    return "".join(parts)
+
+
+def _build_entity_to_docs(doc_entity_map: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    构建 实体 -> 来源文献 的倒排索引，替代前端点击时对所有文献的线性扫描
+    
+    Args:
+        doc_entity_map: 文档-实体映射 {文献名: {keywords: [...], methods: [...], ...}}
+        
+    Returns:
+        {实体名: [文献名, ...]}，文献顺序与 doc_entity_map 一致
+    """
+    entity_to_docs: Dict[str, List[str]] = defaultdict(list)
+    for doc_name, entities in doc_entity_map.items():
+        seen = set()
+        for field in _DOC_ENTITY_FIELDS:
+            for entity in entities.get(field) or ():
+                if entity not in seen:
+                    seen.add(entity)
+                    entity_to_docs[entity].append(doc_name)
+    return entity_to_docs
+
+
+def save_graph_html(html_content: str, filename: str = "knowledge_graph.html") -> str:
+    """
+    将图谱 HTML 导出到 GRAPHS_DIR（仅用于显式导出，渲染路径不调用）
+    
+    文件按内容哈希命名并附带 .gz 压缩副本，内容未变化时不重复写盘；
+    filename 作为指向最新导出文件的链接保留，兼容旧路径。
+    
+    Args:
+        html_content: render_graph_html 生成的 HTML
+        filename: 兼容旧版的固定文件名
+        
+    Returns:
+        导出文件的路径
+    """
+    raw = html_content.encode("utf-8")
+    digest = hashlib.blake2b(raw, digest_size=8).hexdigest()
+    filepath = GRAPHS_DIR / f"kg_{digest}.html"
+    
+    if not filepath.exists():
+        filepath.write_bytes(raw)
+        with gzip.open(f"{filepath}.gz", "wb", compresslevel=6) as f:
+            f.write(raw)
+    
+    link_path = GRAPHS_DIR / filename
+    try:
+        if link_path.is_symlink() and os.readlink(link_path) == filepath.name:
+            return str(filepath)
+        if link_path.is_symlink() or link_path.exists():
+            link_path.unlink()
+        link_path.symlink_to(filepath.name)
+    except OSError:
+        # 不支持符号链接的环境（如 Windows 默认权限）退回为直接写入
+        link_path.write_bytes(raw)
+    
+    return str(filepath)
 
 
 def nx_graph_to_d3_data_filtered(nx_graph: nx.Graph, selected_types: list, top_n_limit: int = 100) -> Dict[str, Any]:
@@ -806,6 +1633,8 @@ def nx_graph_to_d3_data_filtered(nx_graph: nx.Graph, selected_types: list, top_n
     # 分离文档节点和实体节点
     doc_nodes = []
     entity_nodes = []
+    raw_ids = {}  # 字符串 ID -> 原始节点 ID，供边过滤时直接用原始 ID 查找
+    degrees = dict(nx_graph.degree())  # 一次性取出所有节点的度，避免循环内逐个查询
     
     for node_id, attrs in nx_graph.nodes(data=True):
         node_type = attrs.get("node_type", "keyword")
@@ -823,60 +1652,59 @@ def nx_graph_to_d3_data_filtered(nx_graph: nx.Graph, selected_types: list, top_n
             "id": str(node_id),
             "label": attrs.get("label", str(node_id)),
             "group": node_type,
-            "degree": nx_graph.degree(node_id),
+            "degree": degrees[node_id],
             "docCount": connected_doc_count  # 连接的文献数量
         }
+        if attrs.get("count", 1) > 1:
+            # 粗化产生的合并节点
+            node_data["count"] = attrs["count"]
+            node_data["members"] = attrs.get("members", [])
+        raw_ids[node_data["id"]] = node_id
         
         if node_type == "document":
             doc_nodes.append(node_data)
         else:
             entity_nodes.append(node_data)
     
-    # 按 degree 降序排序实体节点，取 Top-N
+    # 按 degree 取 Top-N 实体节点（heapq 部分选择，无需全量排序）
     # 优先保留桥梁节点（连接多个文献的节点）
-    entity_nodes.sort(key=lambda x: (x["docCount"], x["degree"]), reverse=True)
-    top_entity_nodes = entity_nodes[:top_n_limit]
+    top_entity_nodes = heapq.nlargest(top_n_limit, entity_nodes, key=lambda x: (x["docCount"], x["degree"]))
     
     # 合并文档节点和 Top-N 实体节点
     data["nodes"] = doc_nodes + top_entity_nodes
     
-    # 收集有效节点 ID 和节点信息映射
-    valid_node_ids = {node["id"] for node in data["nodes"]}
-    node_info_map = {node["id"]: node for node in data["nodes"]}
-    
-    # 只保留两端都在有效节点中的边，并标记桥梁边
-    for u, v, attrs in nx_graph.edges(data=True):
-        u_str, v_str = str(u), str(v)
-        if u_str in valid_node_ids and v_str in valid_node_ids:
-            # 检查是否是桥梁节点与文献的连接
-            u_info = node_info_map.get(u_str, {})
-            v_info = node_info_map.get(v_str, {})
-            
-            is_bridge_link = False
-            # 如果一端是文献，另一端是连接>=2文献的实体，则标记为桥梁边
-            if u_info.get("group") == "document" and v_info.get("docCount", 0) >= 2:
-                is_bridge_link = True
-            elif v_info.get("group") == "document" and u_info.get("docCount", 0) >= 2:
-                is_bridge_link = True
-            
-            data["links"].append({
-                "source": u_str,
-                "target": v_str,
-                "value": attrs.get("weight", 1),
-                "isBridge": is_bridge_link  # 标记桥梁边
-            })
+    # 节点信息映射，以原始节点 ID 为键，被过滤掉的边无需做 str() 转换
+    node_info_map = {raw_ids[node["id"]]: node for node in data["nodes"]}
+    
+    # 只保留两端都在有效节点中的边，并标记桥梁边（只取 weight 属性，不构造完整属性字典）
+    links = data["links"]
+    for u, v, weight in nx_graph.edges(data="weight", default=1):
+        u_info = node_info_map.get(u)
+        if u_info is None:
+            continue
+        v_info = node_info_map.get(v)
+        if v_info is None:
+            continue
+        
+        # 如果一端是文献，另一端是连接>=2文献的实体，则标记为桥梁边
+        is_bridge_link = (
+            (u_info["group"] == "document" and v_info["docCount"] >= 2)
+            or (v_info["group"] == "document" and u_info["docCount"] >= 2)
+        )
+        
+        links.append({
+            "source": u_info["id"],
+            "target": v_info["id"],
+            "value": weight,
+            "isBridge": is_bridge_link  # 标记桥梁边
+        })
     
     return data
 
-def render_graph_statistics(stats: Dict[str, Any]) -> None:
-    """
-    渲染图谱统计信息
-    重构版本：可点击的统计卡片 + 深色/浅色模式兼容 + 可展开实体列表
-    """
-    
-    # 注入 CSS 来移除 Streamlit components.html 创建的 iframe 边框
-    # 这是解决白色边框问题的关键 - 覆盖所有可能的容器和 iframe 样式
-    st.markdown("""
+
+# 移除 Streamlit components.html 创建的 iframe 边框
+# 这是解决白色边框问题的关键 - 覆盖所有可能的容器和 iframe 样式
+_IFRAME_BORDER_CSS = """
     <style>
         /* === 彻底移除所有 iframe 的边框和背景 === */
         iframe {
@@ -921,67 +1749,10 @@ def render_graph_statistics(stats: Dict[str, Any]) -> None:
             border-color: transparent !important;
         }
     </style>
-    """, unsafe_allow_html=True)
-    # 统计卡片 - 使用 Streamlit 原生组件以支持交互
-    cols = st.columns(4)
-    
-    # 获取所有实体列表
-    all_keywords = stats.get("all_keywords", [])
-    all_methods = stats.get("all_methods", [])
-    all_datasets = stats.get("all_datasets", [])
-    all_fields = stats.get("all_fields", [])
-    
-    metrics = [
-        ("📄 文档", stats.get("document_count", 0), "#6366f1", "documents", stats.get("documents", [])),
-        ("🏷️ 关键词", len(all_keywords), "#ec4899", "keywords", all_keywords),
-        ("⚙️ 方法", len(all_methods), "#10b981", "methods", all_methods),
-        ("📊 数据集", len(all_datasets), "#f59e0b", "datasets", all_datasets),
-    ]
-    
-    for col, (label, count, color, key, entities) in zip(cols, metrics):
-        with col:
-            # 使用 st.metric 简洁显示，同时支持浅色/深色模式
-            st.metric(label=label, value=count)
-    
-    # 可展开的完整实体列表
-    st.markdown("---")
-    st.markdown("### 📋 完整实体列表")
-    st.caption("点击下方分类查看完整实体列表")
-    
-    # 关键词列表
-    if all_keywords:
-        with st.expander(f"🏷️ 全部关键词 ({len(all_keywords)}个)", expanded=False):
-            # 使用多列布局
-            kw_cols = st.columns(3)
-            for idx, (kw, count) in enumerate(all_keywords):
-                kw_cols[idx % 3].markdown(f"• **{kw}** ({count})")
-    
-    # 方法列表
-    if all_methods:
-        with st.expander(f"⚙️ 全部方法 ({len(all_methods)}个)", expanded=False):
-            mt_cols = st.columns(3)
-            for idx, (mt, count) in enumerate(all_methods):
-                mt_cols[idx % 3].markdown(f"• **{mt}** ({count})")
-    
-    # 数据集列表
-    if all_datasets:
-        with st.expander(f"📊 全部数据集 ({len(all_datasets)}个)", expanded=False):
-            ds_cols = st.columns(3)
-            for idx, (ds, count) in enumerate(all_datasets):
-                ds_cols[idx % 3].markdown(f"• **{ds}** ({count})")
-    
-    # 领域列表
-    if all_fields:
-        with st.expander(f"🎓 全部研究领域 ({len(all_fields)}个)", expanded=False):
-            fd_cols = st.columns(3)
-            for idx, (fd, count) in enumerate(all_fields):
-                fd_cols[idx % 3].markdown(f"• **{fd}** ({count})")
-    
-    # ===== 核心实体详情（保留，但修复样式）=====
-    st.markdown("---")
-    st.markdown("### 🔥 核心实体详情")
-    
-    css = """
+    """
+
+# 核心实体详情卡片样式（注入到统计 iframe 内）
+_KG_STATS_CSS = """
     <style>
         /* 去除 iframe 默认边框 */
         iframe {
@@ -1053,17 +1824,111 @@ def render_graph_statistics(stats: Dict[str, Any]) -> None:
         }
     </style>
     """
+
+
+def inject_global_css_once() -> None:
+    """
+    注入图谱相关的全局 CSS（移除 components.html iframe 边框），每次脚本运行只注入一次
+    
+    由应用入口在页面初始化后调用；记录由 init_page_config 在每次运行开始时清空。
+    """
+    injected = st.session_state.setdefault("_injected_css", set())
+    if "iframe_border" in injected:
+        return
+    st.markdown(_IFRAME_BORDER_CSS, unsafe_allow_html=True)
+    injected.add("iframe_border")
+
+
+@lru_cache(maxsize=32)
+def _build_tags_cached(items: Tuple[Tuple[str, int], ...], tag_class: str, total: int) -> str:
+    """
+    构建实体标签 HTML（按参数缓存，统计数据不变时重运行直接复用）
+    
+    Args:
+        items: 要显示的 (实体名, 次数) 元组，最多10个
+        tag_class: 标签样式类
+        total: 该分类的实体总数，超出显示数量的部分显示为 "+N 更多"
+        
+    Returns:
+        HTML 字符串
+    """
+    parts = []
+    append = parts.append  # 列表收集后一次拼接，避免逐段 += 反复复制字符串
+    for item, count in items:
+        append(f"<span class='tag {tag_class}'>{item} <span class='tag-count'>({count})</span></span>")
+    if total > len(items):
+        append(f"<span class='tag' style='background: rgba(100,100,100,0.3); color: #94a3b8;'>+{total-len(items)} 更多...</span>")
+    return "".join(parts)
+
+
+def render_graph_statistics(stats: Dict[str, Any]) -> None:
+    """
+    渲染图谱统计信息
+    重构版本：可点击的统计卡片 + 深色/浅色模式兼容 + 可展开实体列表
+    """
+    
+    # iframe 去边框的全局 CSS 由应用入口通过 inject_global_css_once 注入
+    # 获取所有实体列表
+    all_keywords = stats.get("all_keywords", [])
+    all_methods = stats.get("all_methods", [])
+    all_datasets = stats.get("all_datasets", [])
+    all_fields = stats.get("all_fields", [])
+    
+    # 统计卡片 - 合并为单个表格渲染，每次 rerun 只挂载一个组件
+    counts = {
+        "📄 文档": [stats.get("document_count", 0)],
+        "🏷️ 关键词": [len(all_keywords)],
+        "⚙️ 方法": [len(all_methods)],
+        "📊 数据集": [len(all_datasets)],
+    }
+    st.dataframe(counts, hide_index=True, use_container_width=True)
+    
+    # 可展开的完整实体列表
+    st.markdown("---")
+    st.markdown("### 📋 完整实体列表")
+    st.caption("选择下方分类查看完整实体列表")
+    
+    # 关键词 / 方法 / 数据集 / 领域列表：单选切换分类，每次只渲染选中的一个列表
+    # （折叠的 expander 和 st.tabs 都会渲染全部内容）
+    # 选项用固定的分类名，数量只放在显示文本里，文献增加后仍能保持已选的分类
+    entity_lists = {
+        "keywords": all_keywords,
+        "methods": all_methods,
+        "datasets": all_datasets,
+        "fields": all_fields,
+    }
+    list_labels = {
+        "keywords": "🏷️ 关键词",
+        "methods": "⚙️ 方法",
+        "datasets": "📊 数据集",
+        "fields": "🎓 研究领域",
+    }
+    entity_lists = {name: items for name, items in entity_lists.items() if items}
+    if entity_lists:
+        selected_list = st.radio(
+            "实体分类",
+            options=list(entity_lists),
+            format_func=lambda name: f"{list_labels[name]} ({len(entity_lists[name])})",
+            horizontal=True,
+            label_visibility="collapsed",
+            key="kg_stats_entity_list"
+        )
+        # 使用多列布局
+        list_cols = st.columns(3)
+        for idx, (name, count) in enumerate(entity_lists[selected_list]):
+            list_cols[idx % 3].markdown(f"• **{name}** ({count})")
+    
+    # ===== 核心实体详情（保留，但修复样式）=====
+    st.markdown("---")
+    st.markdown("### 🔥 核心实体详情")
+    
     
     def build_tags(items, tag_class):
         """构建实体标签HTML，空数据返回空字符串以隐藏整个分类"""
         if not items:
             return ""
-        tags = ""
-        for item, count in items[:10]:  # 只显示前10个
-            tags += f"<span class='tag {tag_class}'>{item} <span class='tag-count'>({count})</span></span>"
-        if len(items) > 10:
-            tags += f"<span class='tag' style='background: rgba(100,100,100,0.3); color: #94a3b8;'>+{len(items)-10} 更多...</span>"
-        return tags
+        # 只有前10个参与显示，缓存键只取这部分 + 总数
+        return _build_tags_cached(tuple(tuple(item) for item in items[:10]), tag_class, len(items))
     
     # 构建各分类的标签
     keywords_html = build_tags(stats.get("top_keywords", []), "tag-kw")
@@ -1125,7 +1990,7 @@ def render_graph_statistics(stats: Dict[str, Any]) -> None:
                     background: transparent;
                 }}
             </style>
-            {css}
+            {_KG_STATS_CSS}
         </head>
         <body style="margin: 0; padding: 0; background: transparent;">
             <div class="kg-stats-container">
@@ -1141,6 +2006,28 @@ def render_legend() -> None:
     pass
 
 
+@st.cache_data(max_entries=2048, show_spinner=False)
+def _cached_entity_sources(_knowledge_graph, graph_signature: tuple, entity_name: str) -> Tuple[str, ...]:
+    """
+    查询实体的来源文献（按图签名 + 实体名缓存）
+    
+    _knowledge_graph 不参与哈希，由 graph_signature 代表图谱内容，图谱变化时自动失效。
+    
+    Args:
+        _knowledge_graph: KnowledgeGraph 实例
+        graph_signature: _graph_signature 的结果
+        entity_name: 实体名称
+        
+    Returns:
+        来源文献名称元组
+    """
+    return tuple(_knowledge_graph.get_entity_sources(entity_name))
+
+
+# 实体来源列表每批显示的实体数量
+_ENTITY_WINDOW = 30
+
+
 def render_entity_source_expanders(stats: Dict[str, Any], knowledge_graph) -> None:
     """
     渲染可展开的实体列表，点击实体可查看来源文献
@@ -1161,45 +2048,73 @@ def render_entity_source_expanders(stats: Dict[str, Any], knowledge_graph) -> No
         ("applications", "all_applications", "💻 应用场景", "#06b6d4"),
     ]
     
+    # 图签名每次渲染只计算一次，作为来源查询的缓存键
+    graph_signature = _graph_signature(knowledge_graph.graph) if knowledge_graph else None
+    
     for etype, stats_key, label, color in entity_types:
         entities = stats.get(stats_key, [])
         if not entities:
             continue
         
-        with st.expander(f"{label} ({len(entities)}个)", expanded=False):
-            # 使用列布局显示实体标签
-            cols = st.columns(3)
-            for idx, (entity_name, count) in enumerate(entities):
-                col = cols[idx % 3]
-                
-                # 每个实体是一个小卡片
-                with col:
-                    # 创建一个小型的 expander 显示来源
-                    entity_key = f"entity_{etype}_{idx}"
-                    
-                    # 使用 HTML 显示实体标签
-                    col.markdown(f"""
-                    <div style="
-                        background: rgba(51, 65, 85, 0.4);
-                        border: 1px solid {color}40;
-                        border-radius: 8px;
-                        padding: 8px 12px;
-                        margin-bottom: 8px;
-                        cursor: pointer;
-                    ">
-                        <div style="color: {color}; font-weight: 600; font-size: 13px;">{entity_name}</div>
-                        <div style="color: #94a3b8; font-size: 11px;">出现 {count} 次</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # 查询来源文献
-                    if knowledge_graph:
-                        sources = knowledge_graph.get_entity_sources(entity_name)
-                        if sources:
-                            with st.popover(f"📄 来源 ({len(sources)})"):
-                                st.markdown("**来源文献:**")
-                                for src in sources:
-                                    st.markdown(f"- 📄 {src}")
+        # 用开关代替 expander：折叠的 expander 仍会渲染全部内容，开关关闭时整个分类直接跳过
+        if not st.toggle(f"{label} ({len(entities)}个)", key=f"open_{etype}"):
+            continue
+        
+        # 分批显示，点击"加载更多"再渲染下一批
+        limit_key = f"entity_limit_{etype}"
+        limit = st.session_state.get(limit_key, _ENTITY_WINDOW)
+        
+        # 使用列布局显示实体标签；每列的卡片先拼好，整列只调用一次 markdown
+        cols = st.columns(3)
+        col_bufs = [[], [], []]
+        card_style = (
+            f"background: rgba(51, 65, 85, 0.4); border: 1px solid {color}40; "
+            f"border-radius: 8px; padding: 8px 12px; margin-bottom: 8px;"
+        )
+        for idx, (entity_name, count) in enumerate(entities[:limit]):
+            # 来源文献直接列在卡片中（不再为每个实体创建 popover）
+            sources_html = ""
+            if knowledge_graph:
+                sources = _cached_entity_sources(knowledge_graph, graph_signature, entity_name)
+                if sources:
+                    sources_html = (
+                        f'<div style="color: #cbd5e1; font-size: 11px; margin-top: 4px;">'
+                        f'📄 来源 ({len(sources)}): {"、".join(sources)}</div>'
+                    )
+            
+            # 每个实体是一个小卡片（不带缩进，整列拼接后缩进会被 markdown 识别为代码块）
+            col_bufs[idx % 3].append(
+                f'<div style="{card_style}">'
+                f'<div style="color: {color}; font-weight: 600; font-size: 13px;">{entity_name}</div>'
+                f'<div style="color: #94a3b8; font-size: 11px;">出现 {count} 次</div>'
+                f'{sources_html}</div>'
+            )
+        for col, buf in zip(cols, col_bufs):
+            if buf:
+                col.markdown("\n".join(buf), unsafe_allow_html=True)
+        
+        if len(entities) > limit:
+            if st.button(f"加载更多（还有 {len(entities) - limit} 个）", key=f"more_{etype}"):
+                st.session_state[limit_key] = limit + _ENTITY_WINDOW
+                st.rerun()
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_source_counts(_knowledge_graph, graph_signature: tuple, entities: Tuple[str, ...]) -> Dict[str, int]:
+    """
+    批量统计实体的来源文献数量（按图签名 + 实体列表缓存）
+    
+    _knowledge_graph 不参与哈希，由 graph_signature 代表图谱内容。
+    
+    Args:
+        _knowledge_graph: KnowledgeGraph 实例
+        graph_signature: _graph_signature 的结果
+        entities: 实体名称元组
+        
+    Returns:
+        实体名称 -> 来源文献数量 的字典
+    """
+    return _knowledge_graph.get_entity_source_counts(entities)
 
 
 def render_entity_source_buttons(stats: Dict[str, Any], knowledge_graph) -> None:
@@ -1221,10 +2136,13 @@ def render_entity_source_buttons(stats: Dict[str, Any], knowledge_graph) -> None
     methods = stats.get("all_methods", [])[:10]
     
     # 预计算每个实体的来源文献数量（修复：显示来源文献数而非出现次数）
-    def get_source_count(entity_name: str) -> int:
-        if knowledge_graph:
-            return len(knowledge_graph.get_entity_sources(entity_name))
-        return 0
+    # 一次遍历批量统计，按图签名缓存，按钮点击引起的重运行直接命中
+    source_counts = {}
+    graph_signature = None
+    if knowledge_graph:
+        graph_signature = _graph_signature(knowledge_graph.graph)
+        entity_names = tuple(name for name, _count in keywords) + tuple(name for name, _count in methods)
+        source_counts = _cached_source_counts(knowledge_graph, graph_signature, entity_names)
     
     if keywords:
         st.markdown("**🏷️ 高频关键词:**")
@@ -1232,7 +2150,7 @@ def render_entity_source_buttons(stats: Dict[str, Any], knowledge_graph) -> None
         for idx, (name, _count) in enumerate(keywords):
             with cols[idx % 6]:
                 # 显示来源文献数量而非出现次数
-                source_count = get_source_count(name)
+                source_count = source_counts.get(name, 0)
                 if st.button(f"{name} ({source_count})", key=f"kw_{idx}", use_container_width=True):
                     st.session_state.selected_entity = name
     
@@ -1241,7 +2159,7 @@ def render_entity_source_buttons(stats: Dict[str, Any], knowledge_graph) -> None
         cols = st.columns(6)
         for idx, (name, _count) in enumerate(methods):
             with cols[idx % 6]:
-                source_count = get_source_count(name)
+                source_count = source_counts.get(name, 0)
                 if st.button(f"{name} ({source_count})", key=f"mt_{idx}", use_container_width=True):
                     st.session_state.selected_entity = name
     
@@ -1249,7 +2167,7 @@ def render_entity_source_buttons(stats: Dict[str, Any], knowledge_graph) -> None
     if st.session_state.selected_entity and knowledge_graph:
         st.markdown("---")
         entity = st.session_state.selected_entity
-        sources = knowledge_graph.get_entity_sources(entity)
+        sources = _cached_entity_sources(knowledge_graph, graph_signature, entity)
         
         st.markdown(f"### 🔍 「{entity}」的来源文献")
         if sources:
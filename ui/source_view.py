@@ -7,6 +7,9 @@ Citation Source View Module
 
 import re
 import html
+import hashlib
+import time
+from functools import lru_cache
 import streamlit as st
 from typing import List, Dict, Optional
 
@@ -26,10 +29,21 @@ CITATION_COLORS = [
     "#6366F1",  # doc_9: 靛蓝
 ]
 
+# 匹配 [doc_X] 格式（支持 [doc_0][doc_1] 连续形式），模块级预编译，每次渲染直接复用
+_CITATION_RE = re.compile(r'\[(doc_\d+)\]')
 
+# 回答超过该长度（字符数）时只直接渲染前半部分，其余放入折叠区，避免超长 markdown 拖慢前端
+_MARKDOWN_SIZE_THRESHOLD = 8000
+
+# 流式输出的最小刷新间隔（秒），合并短时间内连续到达的 token，减少整段 markdown 重新解析
+_LAST_RENDER_TS = "_last_stream_render_ts"
+_MIN_INTERVAL = 0.1
+
+
+@lru_cache(maxsize=None)
 def get_citation_color(doc_id: str) -> str:
     """
-    根据 doc_id 获取对应的颜色
+    根据 doc_id 获取对应的颜色（纯函数，结果缓存；实际出现的 doc_id 只有少数几个）
     
     Args:
         doc_id: 如 "doc_0", "doc_1" 等
@@ -37,21 +51,14 @@ def get_citation_color(doc_id: str) -> str:
     Returns:
         颜色十六进制值
     """
-    try:
-        idx = int(doc_id.replace("doc_", ""))
-        return CITATION_COLORS[idx % len(CITATION_COLORS)]
-    except:
+    match = re.fullmatch(r"doc_(\d+)", doc_id)
+    if match is None:
         return CITATION_COLORS[0]
+    return CITATION_COLORS[int(match.group(1)) % len(CITATION_COLORS)]
 
 
-def get_citation_css() -> str:
-    """
-    获取引用溯源相关的 CSS 样式
-    
-    Returns:
-        CSS 样式字符串
-    """
-    return """
+# 引用溯源相关的 CSS 样式（静态内容，模块加载时构建一次）
+_CITATION_CSS = """
     <style>
         /* 引用标记样式 - 气泡中的 [doc_X] */
         .citation-tag {
@@ -113,6 +120,31 @@ def get_citation_css() -> str:
     """
 
 
+def get_citation_css() -> str:
+    """
+    获取引用溯源相关的 CSS 样式
+    
+    Returns:
+        CSS 样式字符串
+    """
+    return _CITATION_CSS
+
+
+def _inject_citation_css_once():
+    """
+    注入引用溯源 CSS，每次脚本运行只注入一次
+    
+    聊天记录中每条回答都会调用渲染函数，避免重复下发相同的 <style> 块。
+    已注入记录保存在 st.session_state["_injected_css"] 中，由 init_page_config 在每次运行开始时清空
+    （Streamlit 重运行后未再次输出的元素会被移除，因此不能整个会话只注入一次）。
+    """
+    injected = st.session_state.setdefault("_injected_css", set())
+    if "citation" in injected:
+        return
+    st.markdown(_CITATION_CSS, unsafe_allow_html=True)
+    injected.add("citation")
+
+
 def render_answer_with_citations(answer: str, sources: List[dict]) -> str:
     """
     将回答中的 [doc_X] 引用标记转换为带颜色的可视化标签
@@ -124,15 +156,19 @@ def render_answer_with_citations(answer: str, sources: List[dict]) -> str:
     Returns:
         处理后的 HTML 文本
     """
-    # 获取有效的 doc_id 集合
-    valid_doc_ids = {s.get("doc_id", f"doc_{i}") for i, s in enumerate(sources)}
+    # 没有任何引用标记时直接返回（子串查找远快于正则扫描，流式输出时每次更新都会调用）
+    if '[doc_' not in answer:
+        return answer
+    
+    # 获取有效的 doc_id 集合（与来源面板一致：缺少 doc_id 时按位置编号）
+    valid_doc_ids = frozenset(s.get("doc_id", f"doc_{i}") for i, s in enumerate(sources))
     
-    def replace_citation(match):
-        """替换单个引用标记为彩色标签"""
+    def replace_citation(match, _valid=valid_doc_ids):
+        """替换单个引用标记为彩色标签（有效 ID 集合作为默认参数绑定为局部变量）"""
         doc_id = match.group(1)  # 如 "doc_0"
         
         # 检查是否为有效引用
-        if doc_id not in valid_doc_ids:
+        if doc_id not in _valid:
             return match.group(0)  # 保持原样
         
         color = get_citation_color(doc_id)
@@ -140,13 +176,108 @@ def render_answer_with_citations(answer: str, sources: List[dict]) -> str:
         # 创建带颜色的标签
         return f'<span class="citation-tag" style="background: {color};" title="查看来源 {doc_id}">{doc_id}</span>'
     
-    # 匹配 [doc_X] 格式（支持 [doc_0][doc_1] 连续形式）
-    pattern = r'\[(doc_\d+)\]'
-    processed_answer = re.sub(pattern, replace_citation, answer)
+    processed_answer = _CITATION_RE.sub(replace_citation, answer)
     
     return processed_answer
 
 
+def _escape_if_needed(text: str) -> str:
+    """HTML 转义；不含 < > & 的纯文本（论文内容的常见情况）直接返回，省去逐字符替换"""
+    if '<' in text or '>' in text or '&' in text:
+        return html.escape(text)
+    return text
+
+
+@lru_cache(maxsize=512)
+def _render_source_html(doc_id: str, source_file: str, page, content: str) -> str:
+    """
+    生成单个源文档的 HTML（标题栏 + 内容区），按参数缓存
+    
+    聊天记录每次重运行都会重新渲染所有来源，相同来源直接复用已转义、拼接好的 HTML。
+    
+    Args:
+        doc_id: 如 "doc_0"
+        source_file: 来源文件名
+        page: 页码
+        content: 已截断的内容
+        
+    Returns:
+        HTML 字符串
+    """
+    color = get_citation_color(doc_id)
+    
+    # 转义 HTML 特殊字符防止渲染错误；同样转义文件名（可能含有特殊字符）
+    display_content = _escape_if_needed(content)
+    safe_source_file = _escape_if_needed(source_file)
+    
+    # 不带缩进：多个来源拼接后整体作为一个 HTML 块交给 markdown，缩进会被识别为代码块
+    return (
+        f'<div class="source-header" style="background: {color};">'
+        f'<strong>[{doc_id}]</strong> {safe_source_file} · 第 {page} 页</div>\n'
+        f'<div class="source-content">{display_content}</div>\n'
+        f'<br>'
+    )
+
+
+def should_render_now(stream_id: str, force: bool = False) -> bool:
+    """
+    流式输出节流：距上次渲染不足 _MIN_INTERVAL 时返回 False
+    
+    调用方在每个 token 到达时调用，返回 True 才执行渲染（如 render_streaming_answer）；
+    最后一次更新传入 force=True，保证完整内容一定会被渲染。
+    
+    Args:
+        stream_id: 本次流式输出的标识
+        force: 是否忽略时间间隔强制渲染
+        
+    Returns:
+        本次是否应当渲染（返回 True 时同时记录渲染时间）
+    """
+    key = _LAST_RENDER_TS + stream_id
+    now = time.monotonic()
+    if not force and now - st.session_state.get(key, 0) < _MIN_INTERVAL:
+        return False
+    st.session_state[key] = now
+    return True
+
+
+def render_streaming_answer(answer: str, sources: List[dict], stream_id: str,
+                            placeholder=None, final: bool = False):
+    """
+    渲染流式输出中不断增长的回答，已完成的段落只处理一次
+    
+    以最后一个空行（\\n\\n）为界，之前的内容视为稳定块：引用替换后的 HTML 缓存在
+    st.session_state[f"_stable_blocks_{stream_id}"] 中，之后每次更新只重新处理末尾未完成的段落。
+    引用标记不会跨越空行，因此拼接结果与整体调用 render_answer_with_citations 一致。
+    
+    Args:
+        answer: 当前已生成的回答文本
+        sources: 源文档列表
+        stream_id: 本次流式输出的标识，用于区分缓存
+        placeholder: 渲染目标（通常为 st.empty()，每次更新替换内容），为 None 时直接输出
+        final: 是否为最后一次更新，是则渲染后清除缓存及节流时间记录
+    """
+    state_key = f"_stable_blocks_{stream_id}"
+    state = st.session_state.get(state_key)
+    if state is None or len(answer) < state["length"]:
+        # 首次渲染，或同一 stream_id 开始了新的输出
+        state = st.session_state[state_key] = {"length": 0, "blocks": []}
+    
+    # 新完成的段落追加为稳定块
+    cut = answer.rfind("\n\n")
+    if cut > state["length"]:
+        state["blocks"].append(render_answer_with_citations(answer[state["length"]:cut], sources))
+        state["length"] = cut
+    
+    tail = render_answer_with_citations(answer[state["length"]:], sources)
+    target = placeholder if placeholder is not None else st
+    target.markdown("".join(state["blocks"]) + tail, unsafe_allow_html=True)
+    
+    if final:
+        del st.session_state[state_key]
+        st.session_state.pop(_LAST_RENDER_TS + stream_id, None)
+
+
 def render_source_panel(sources: List[dict], expanded: bool = False):
     """
     渲染源文档面板，带与引用标记匹配的颜色标识
@@ -158,53 +289,57 @@ def render_source_panel(sources: List[dict], expanded: bool = False):
     if not sources:
         return
     
-    # 注入 CSS
-    st.markdown(get_citation_css(), unsafe_allow_html=True)
+    # 注入 CSS（本次运行已注入时跳过）
+    _inject_citation_css_once()
     
     # 使用 expander 折叠源文档区域
     expander_label = f"📚 引用来源 ({len(sources)} 个)"
     
     with st.expander(expander_label, expanded=expanded):
-        # 提示文字
-        st.markdown(
+        # 提示文字 + 所有源文档拼接后一次性输出，只产生一个 markdown 元素
+        html_parts = [
             '<div class="citation-hint">💡 提示：回答中的标记颜色与下方来源标题颜色一致，可快速定位对应内容。</div>',
-            unsafe_allow_html=True
-        )
-        
-        st.markdown("<br>", unsafe_allow_html=True)
+            "<br>"
+        ]
         
         # 渲染所有源文档（不限制数量）
         for idx, source in enumerate(sources):
             doc_id = source.get("doc_id", f"doc_{idx}")
-            color = get_citation_color(doc_id)
-            
             source_file = source.get("source_file", "未知文件")
             page = source.get("page", "?")
             content = source.get("content", "")
             
-            # 截断内容避免过长，并转义 HTML 特殊字符防止渲染错误
+            # 截断内容避免过长（先截断再作为缓存键，键的大小有上限）
             truncated_content = content[:500] + "..." if len(content) > 500 else content
-            display_content = html.escape(truncated_content)
-            
-            # 同样转义文件名（可能含有特殊字符）
-            safe_source_file = html.escape(str(source_file))
             
-            # 渲染带颜色的标题栏
-            st.markdown(
-                f'''
-                <div class="source-header" style="background: {color};">
-                    <strong>[{doc_id}]</strong> {safe_source_file} · 第 {page} 页
-                </div>
-                <div class="source-content">
-                    {display_content}
-                </div>
-                <br>
-                ''',
-                unsafe_allow_html=True
-            )
-
-
-def render_chat_answer_with_sources(answer: str, sources: List[dict], is_latest: bool = False):
+            # 带颜色的标题栏 + 内容
+            html_parts.append(_render_source_html(doc_id, str(source_file), page, truncated_content))
+        
+        st.markdown("\n".join(html_parts), unsafe_allow_html=True)
+
+
+def _split_long_markdown(text: str, limit: int) -> tuple:
+    """
+    在不超过 limit 的最后一个段落边界处切分文本，避免从表格、列表或代码块中间截断
+    
+    Args:
+        text: markdown 文本
+        limit: 前半部分的最大长度
+        
+    Returns:
+        (前半部分, 剩余部分)；找不到合适的段落边界时剩余部分为空字符串
+    """
+    cut = text.rfind("\n\n", 0, limit)
+    # 代码块围栏 ``` 数量为奇数说明切点落在代码块内，继续向前找
+    while cut > 0 and text.count("```", 0, cut) % 2 == 1:
+        cut = text.rfind("\n\n", 0, cut)
+    if cut <= 0:
+        return text, ""
+    return text[:cut], text[cut + 2:]
+
+
+def render_chat_answer_with_sources(answer: str, sources: List[dict], is_latest: bool = False,
+                                    key: Optional[str] = None):
     """
     渲染带引用标记的完整问答和源文档
     
@@ -215,15 +350,30 @@ def render_chat_answer_with_sources(answer: str, sources: List[dict], is_latest:
         answer: AI 回答文本
         sources: 源文档列表
         is_latest: 是否是最新问答（最新的可以默认展开源文档）
+        key: 组件 key 前缀，用于区分多条问答的"显示剩余内容"开关；缺省时按回答内容生成
     """
-    # 注入 CSS
-    st.markdown(get_citation_css(), unsafe_allow_html=True)
+    # 注入 CSS（本次运行已注入时跳过）
+    _inject_citation_css_once()
     
     # 处理回答中的引用标记
     processed_answer = render_answer_with_citations(answer, sources)
     
     # 使用 Streamlit markdown 渲染（支持原有 markdown 格式）
-    st.markdown(processed_answer, unsafe_allow_html=True)
+    # 超长回答在段落边界处切分；剩余部分放在开关后面（折叠的 expander 仍会渲染全部内容），
+    # 打开开关时才输出到页面
+    head, rest = processed_answer, ""
+    if len(processed_answer) > _MARKDOWN_SIZE_THRESHOLD:
+        head, rest = _split_long_markdown(processed_answer, _MARKDOWN_SIZE_THRESHOLD)
+    if rest:
+        if key is None:
+            key = hashlib.md5(answer.encode("utf-8")).hexdigest()[:12]
+        toggle_key = f"{key}_show_rest"
+        show_rest = st.session_state.get(toggle_key, False)
+        st.markdown(head if show_rest else head + "\n\n…", unsafe_allow_html=True)
+        if st.toggle("📖 显示剩余内容", key=toggle_key):
+            st.markdown(rest, unsafe_allow_html=True)
+    else:
+        st.markdown(processed_answer, unsafe_allow_html=True)
     
     # 渲染源文档面板（最新问答默认展开）
     if sources: